@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 import argparse
-import json
 import os
 import sys
 from typing import Any
 
+from harness_common import canonical_paths, enable_cache, loads
+
 
 def _load_harness():
     here = os.path.dirname(os.path.abspath(__file__))
@@ -14,15 +15,21 @@ def _load_harness():
     return harness
 
 
-def _allowed(issue: dict[str, Any], parser_name: str, allow_rules: list[dict[str, Any]]) -> bool:
-    for rule in allow_rules:
-        if rule.get("parser") and rule["parser"] != parser_name:
-            continue
-        if rule.get("field") and rule["field"] != issue.get("field"):
-            continue
-        if rule.get("severity") and rule["severity"] != issue.get("severity"):
-            continue
-        return True
+def _index_rules(allow_rules: list[dict[str, Any]]) -> set[tuple[str | None, str | None, str | None]]:
+    # Unset rule dimensions are wildcards and are indexed as None.
+    return {
+        (rule.get("parser") or None, rule.get("field") or None, rule.get("severity") or None)
+        for rule in allow_rules
+    }
+
+
+def _allowed(issue: dict[str, Any], parser_name: str, rule_index: set[tuple[str | None, str | None, str | None]]) -> bool:
+    field = issue.get("field")
+    severity = issue.get("severity")
+    for p in (parser_name, None):
+        for f in (field, None):
+            if (p, f, severity) in rule_index or (p, f, None) in rule_index:
+                return True
     return False
 
 
@@ -34,25 +41,30 @@ def main() -> int:
     ap.add_argument("--elixir-root", default="/home/sprite/outlook_msg")
     ap.add_argument("--msg-viewer-root", default="/home/sprite/msg-viewer")
     ap.add_argument("--with-msg-viewer", action="store_true")
+    ap.add_argument("--cache", action="store_true", help="reuse cached parser rows; same cache and row content as msg_diff_harness.py --cache")
     args = ap.parse_args()
 
-    with open(args.policy, "r", encoding="utf-8") as fh:
-        policy = json.load(fh)
+    harness = _load_harness()
+    if args.cache:
+        enable_cache()
+    with open(args.policy, "rb") as fh:
+        policy = loads(fh.read())
 
     baseline = policy.get("baseline_parser", "ruby-msg")
     fail_on = set(policy.get("fail_on_severity", ["high"]))
-    allow_rules = policy.get("allow_rules", [])
+    rule_index = _index_rules(policy.get("allow_rules", []))
 
-    files = [os.path.abspath(f) for f in args.files]
-    harness = _load_harness()
+    files = canonical_paths(args.files)
 
-    parsers: dict[str, dict[str, dict[str, Any]]] = {
-        "ruby-msg": harness.parse_ruby(files, args.ruby_root),
-        "outlook_msg": harness.parse_elixir(files, args.elixir_root),
-        "extract-msg": harness.parse_extract_msg(files),
-    }
+    jobs: list[tuple[str, Any, tuple[Any, ...]]] = [
+        ("ruby-msg", harness.parse_ruby, (files, args.ruby_root)),
+        ("outlook_msg", harness.parse_elixir, (files, args.elixir_root)),
+        ("extract-msg", harness.parse_extract_msg, (files,)),
+    ]
     if args.with_msg_viewer:
-        parsers["msg-viewer"] = harness.parse_msg_viewer(files, args.msg_viewer_root)
+        jobs.append(("msg-viewer", harness.parse_msg_viewer, (files, args.msg_viewer_root)))
+
+    parsers = harness.run_parsers(jobs)
 
     diff = harness.baseline_diff(files, parsers, baseline)
 
@@ -64,7 +76,7 @@ def main() -> int:
                 sev = issue.get("severity")
                 if sev not in fail_on:
                     continue
-                if _allowed(issue, parser_name, allow_rules):
+                if _allowed(issue, parser_name, rule_index):
                     continue
                 violations.append(
                     f"[{name}] [{parser_name}] [{sev}] {issue.get('field')} "
@@ -1,13 +1,22 @@
 #!/usr/bin/env python3
 import argparse
-import base64
+from base64 import b64decode as _b64d
 import email
 from email import policy
-import json
 import os
+import re
 import subprocess
 from typing import Any
 
+from harness_common import canonical_paths, dumps_pretty
+
+
+# ROW|file|subject|from|to|cc|content_type|multipart|parts_count|body_len|preview
+# Text fields are base64, so only the path can contain "|"; the greedy path group
+# backtracks over it.
+_B64 = r"([A-Za-z0-9+/=]*)"
+_ROW_RE = re.compile(r"ROW\|(.+)\|" + r"\|".join([_B64] * 5) + r"\|([01])\|(\d+)\|(\d+)\|" + _B64 + r"\s*$")
+
 
 def _norm(v: Any) -> str:
     if v is None:
@@ -18,13 +27,15 @@ def _norm(v: Any) -> str:
 
 
 def _run(cmd: list[str], cwd: str) -> str:
-    p = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    p = subprocess.run(cmd, cwd=cwd, capture_output=True)
     if p.returncode != 0:
-        raise RuntimeError(f"Command failed: {' '.join(cmd)}\nSTDERR:\n{p.stderr}")
-    return p.stdout
+        raise RuntimeError(f"Command failed: {' '.join(cmd)}\nSTDERR:\n{p.stderr.decode('utf-8', errors='replace')}")
+    return p.stdout.decode("utf-8", errors="replace")
 
 
 def parse_elixir(files: list[str], elixir_root: str) -> dict[str, dict[str, Any]]:
+    # Header fields and the body preview are normalized by norm/1 before
+    # encoding; only parse_python's stdlib values need _norm.
     ex = r'''
 alias OutlookMsg.Mime
 
@@ -71,25 +82,24 @@ end
     out = _run(["mix", "run", "-e", ex, "--", *files], cwd=elixir_root)
     rows: dict[str, dict[str, Any]] = {}
     for line in out.splitlines():
-      parts = line.strip().split("|")
-      if not parts:
-        continue
-      if parts[0] == "ROW" and len(parts) >= 11:
-        _, file, subj, frm, to, cc, ctype, multipart, parts_count, blen, prev = parts[:11]
-        dec = lambda s: base64.b64decode(s).decode("utf-8", errors="replace")
+      m = _ROW_RE.match(line)
+      if m:
+        file, subj, frm, to, cc, ctype, multipart, parts_count, blen, prev = m.groups()
         rows[file] = {
-          "subject": dec(subj),
-          "from": dec(frm),
-          "to": dec(to),
-          "cc": dec(cc),
-          "content_type": dec(ctype),
+          "subject": _b64d(subj).decode("utf-8", errors="replace"),
+          "from": _b64d(frm).decode("utf-8", errors="replace"),
+          "to": _b64d(to).decode("utf-8", errors="replace"),
+          "cc": _b64d(cc).decode("utf-8", errors="replace"),
+          "content_type": _b64d(ctype).decode("utf-8", errors="replace"),
           "multipart": multipart == "1",
           "parts_count": int(parts_count),
           "body_len": int(blen),
-          "body_preview": dec(prev),
+          "body_preview": _b64d(prev).decode("utf-8", errors="replace"),
         }
-      elif parts[0] == "ERR" and len(parts) >= 3:
-        rows[parts[1]] = {"error": base64.b64decode(parts[2]).decode("utf-8", errors="replace")}
+        continue
+      parts = line.strip().split("|")
+      if parts[0] == "ERR" and len(parts) >= 3:
+        rows[parts[1]] = {"error": _b64d(parts[2]).decode("utf-8", errors="replace")}
     return rows
 
 
@@ -100,8 +110,10 @@ def parse_python(files: list[str]) -> dict[str, dict[str, Any]]:
         with open(f, "rb") as fh:
           msg = email.message_from_binary_file(fh, policy=policy.default)
 
+        is_multi = msg.is_multipart()
+        payload = msg.get_payload()
         body = ""
-        if msg.is_multipart():
+        if is_multi:
           # first text/plain part
           for part in msg.walk():
             if part.get_content_type() == "text/plain":
@@ -116,16 +128,29 @@ def parse_python(files: list[str]) -> dict[str, dict[str, Any]]:
           except Exception:
             body = str(msg.get_payload(decode=True) or b"", errors="replace")
 
+        get = msg.get
+        subject = _norm(get("Subject", ""))
+        frm = _norm(get("From", ""))
+        to = _norm(get("To", ""))
+        cc = _norm(get("Cc", ""))
+        ctype = _norm(get("Content-Type", ""))
+        parts_count = len(payload) if is_multi and isinstance(payload, list) else 0
+        body_len = len(body) if body else 0
+        preview = _norm(body[:160]) if body else ""
+        # Drop the parsed tree before the next file so large multipart
+        # payloads do not stay resident while the row is kept.
+        del msg, payload, body, get
+
         rows[f] = {
-          "subject": _norm(msg.get("Subject", "")),
-          "from": _norm(msg.get("From", "")),
-          "to": _norm(msg.get("To", "")),
-          "cc": _norm(msg.get("Cc", "")),
-          "content_type": _norm(msg.get("Content-Type", "")),
-          "multipart": bool(msg.is_multipart()),
-          "parts_count": len(msg.get_payload()) if msg.is_multipart() and isinstance(msg.get_payload(), list) else 0,
-          "body_len": len(body or ""),
-          "body_preview": _norm((body or "")[:160]),
+          "subject": subject,
+          "from": frm,
+          "to": to,
+          "cc": cc,
+          "content_type": ctype,
+          "multipart": bool(is_multi),
+          "parts_count": parts_count,
+          "body_len": body_len,
+          "body_preview": preview,
         }
       except Exception as e:
         rows[f] = {"error": f"{type(e).__name__}: {e}"}
@@ -139,7 +164,7 @@ def main() -> int:
     ap.add_argument("--json", action="store_true")
     args = ap.parse_args()
 
-    files = [os.path.abspath(f) for f in args.files]
+    files = canonical_paths(args.files)
     elx = parse_elixir(files, args.elixir_root)
     py = parse_python(files)
 
@@ -148,7 +173,7 @@ def main() -> int:
       payload["files"][f] = {"outlook_msg": elx.get(f, {}), "python_email": py.get(f, {})}
 
     if args.json:
-      print(json.dumps(payload, indent=2, sort_keys=True))
+      print(dumps_pretty(payload))
       return 0
 
     fields = ["subject", "from", "to", "cc", "content_type", "multipart", "parts_count", "body_len"]
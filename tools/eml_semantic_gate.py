@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 import argparse
 from email.utils import getaddresses
-import os
+import functools
 import sys
 
+from harness_common import canonical_paths
+
 try:
     import eml_diff_harness as harness  # type: ignore
 except Exception as e:
@@ -15,17 +17,15 @@ def _body_tol(expected_len: int) -> int:
     return max(64, int(expected_len * 0.2))
 
 
-def _norm_addr(value: str) -> str:
-    pairs = getaddresses([value or ""])
-    norm: list[str] = []
-    for name, addr in pairs:
-        name = " ".join((name or "").split())
+@functools.lru_cache(maxsize=8192)
+def _addr_set(value: str) -> frozenset[tuple[str, str]]:
+    # Order-insensitive: "a@x, b@x" and "b@x, a@x" are the same recipients.
+    pairs: set[tuple[str, str]] = set()
+    for name, addr in getaddresses([value or ""]):
         addr = " ".join((addr or "").split())
-        if name and addr:
-            norm.append(f"{name} <{addr}>")
-        elif addr:
-            norm.append(addr)
-    return ", ".join(norm)
+        if addr:
+            pairs.add((" ".join((name or "").split()), addr))
+    return frozenset(pairs)
 
 
 def main() -> int:
@@ -34,7 +34,7 @@ def main() -> int:
     ap.add_argument("--elixir-root", default="/home/sprite/outlook_msg")
     args = ap.parse_args()
 
-    files = [os.path.abspath(f) for f in args.files]
+    files = canonical_paths(args.files)
     elx = harness.parse_elixir(files, args.elixir_root)
     py = harness.parse_python(files)
 
@@ -51,7 +51,7 @@ def main() -> int:
             failures.append(f"{f}: subject mismatch elixir={a.get('subject')!r} python={b.get('subject')!r}")
 
         for field in ("from", "to", "cc"):
-            if _norm_addr(a.get(field) or "") != _norm_addr(b.get(field) or ""):
+            if _addr_set(a.get(field) or "") != _addr_set(b.get(field) or ""):
                 failures.append(f"{f}: {field} mismatch elixir={a.get(field)!r} python={b.get(field)!r}")
 
         # Content-Type can differ in parameter ordering/casing. Compare main type only.
@@ -0,0 +1,163 @@
+# Helpers shared by the harness and gate scripts in tools/.
+from collections import deque
+import functools
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Any, Callable, Iterable, Iterator
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+# Optional per-file row cache shared by the harness and the gates, one
+# subdirectory per parser. It stays off unless MSG_DIFF_HARNESS_CACHE names a
+# directory or a tool is run with --cache (see enable_cache).
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/outlook_msg_tools")
+CACHE_DIR: str | None = os.environ.get("MSG_DIFF_HARNESS_CACHE") or None
+
+
+def loads(data: str | bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_pretty(obj: Any) -> str:
+    # orjson never escapes non-ASCII, so the stdlib path matches it with
+    # ensure_ascii=False; --json output is the same either way.
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, indent=2, sort_keys=True, ensure_ascii=False)
+
+
+def canonical_paths(paths: Iterable[str]) -> list[str]:
+    # Resolve symlinks and relative paths so a file reached two ways is parsed
+    # and reported under one key. First-seen order is kept.
+    return list(dict.fromkeys(os.path.realpath(p) for p in dict.fromkeys(paths)))
+
+
+def run_lines(cmd: list[str], cwd: str | None = None, env: dict[str, str] | None = None, *, text: bool = True) -> Iterator[Any]:
+    # Yield stdout lines as the subprocess produces them so row parsing overlaps
+    # parser work. Stderr is drained on a side thread to avoid pipe deadlock.
+    # The pipe is read as bytes; text=True decodes each line once (tolerating
+    # stray non-UTF-8 output), text=False hands raw lines to e.g. loads().
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_tail: deque[bytes] = deque(maxlen=200)
+    drain = threading.Thread(target=stderr_tail.extend, args=(proc.stderr,), daemon=True)
+    drain.start()
+    try:
+        if text:
+            for line in proc.stdout:
+                yield line.decode("utf-8", errors="replace")
+        else:
+            yield from proc.stdout
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        drain.join()
+        proc.stderr.close()
+    if returncode != 0:
+        stderr = b"".join(stderr_tail).decode("utf-8", errors="replace")
+        raise RuntimeError(f"Command failed: {' '.join(cmd)}\nSTDERR:\n{stderr}")
+
+
+def newest_mtime(*paths: str) -> tuple[int, int]:
+    # Newest mtime_ns and file count across the given files/directory trees.
+    newest = 0
+    count = 0
+    for path in paths:
+        if os.path.isfile(path):
+            newest = max(newest, os.stat(path).st_mtime_ns)
+            count += 1
+            continue
+        for dirpath, _, names in os.walk(path):
+            for name in names:
+                try:
+                    newest = max(newest, os.stat(os.path.join(dirpath, name)).st_mtime_ns)
+                except OSError:
+                    continue
+                count += 1
+    return newest, count
+
+
+def tree_stamp(*paths: str) -> str:
+    # Cheap fingerprint of a parser implementation.
+    newest, count = newest_mtime(*paths)
+    return f"{newest}:{count}"
+
+
+def elixir_stamp(elixir_root: str, *scripts: str) -> str:
+    # Stamp for rows produced by the outlook_msg library plus the given
+    # emitter/driver scripts.
+    return tree_stamp(os.path.join(elixir_root, "lib"), os.path.join(elixir_root, "mix.exs"), *scripts)
+
+
+def enable_cache() -> None:
+    global CACHE_DIR
+    CACHE_DIR = CACHE_DIR or DEFAULT_CACHE_DIR
+
+
+def _cache_path(parser: str, stamp: str, file: str) -> str | None:
+    try:
+        st = os.stat(file)
+    except OSError:
+        return None
+    key = hashlib.sha1(f"{parser}\0{stamp}\0{file}\0{st.st_mtime_ns}\0{st.st_size}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, parser, key + ".json")
+
+
+def _cache_store(path: str, row: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", dir=os.path.dirname(path), suffix=".tmp", delete=False) as tmp:
+        tmp.write(dumps(row))
+    os.replace(tmp.name, path)
+
+
+def _row_ok(row: Any) -> bool:
+    return "error" not in row
+
+
+def cached(parser: str, stamp: Callable[..., str], cacheable: Callable[[Any], bool] = _row_ok):
+    # Only files whose (path, mtime, size) or parser implementation changed are
+    # handed to the wrapped parser. Rows failing `cacheable` (by default, rows
+    # with an "error" key) are never cached, so they are retried next run.
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(files: list[str], *args: Any) -> dict[str, Any]:
+            if CACHE_DIR is None or not files:
+                return fn(files, *args)
+            impl = stamp(*args)
+            paths = {f: _cache_path(parser, impl, f) for f in files}
+            rows: dict[str, Any] = {}
+            for f, path in paths.items():
+                if path and os.path.isfile(path):
+                    try:
+                        with open(path, "rb") as fh:
+                            rows[f] = loads(fh.read())
+                    except (OSError, ValueError):
+                        pass
+            misses = [f for f in files if f not in rows]
+            if misses:
+                fresh = fn(misses, *args)
+                for f, row in fresh.items():
+                    path = paths.get(f)
+                    if path and cacheable(row):
+                        try:
+                            _cache_store(path, row)
+                        except OSError:
+                            pass
+                rows.update(fresh)
+            return {f: rows[f] for f in files if f in rows}
+
+        return run
+
+    return wrap
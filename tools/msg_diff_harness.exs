@@ -0,0 +1,58 @@
+# Row emitter for tools/msg_diff_harness.py (run from the outlook_msg root):
+#   mix run tools/msg_diff_harness.exs FILE...
+# or, against a current dev build:
+#   elixir -pa _build/dev/lib/outlook_msg/ebin tools/msg_diff_harness.exs FILE...
+
+alias OutlookMsg.Mapi.PropertySet
+
+norm = fn v ->
+  case v do
+    nil -> ""
+    x -> x |> to_string() |> String.replace("\u0000", "") |> String.replace(~r/\s+/, " ") |> String.trim()
+  end
+end
+
+for f <- System.argv() do
+  case OutlookMsg.open(f) do
+    {:ok, msg} ->
+      p = msg.properties
+      body = PropertySet.body(p) || ""
+      html = PropertySet.body_html(p) || ""
+      body = if is_binary(body), do: body, else: inspect(body)
+      html = if is_binary(html), do: html, else: inspect(html)
+      rec = List.first(msg.recipients)
+      subject = norm.(PropertySet.subject(p))
+      from = norm.(PropertySet.sender_name(p)) <> " <" <> norm.(PropertySet.sender_email(p)) <> ">"
+      to = norm.(PropertySet.display_to(p))
+      cc = norm.(PropertySet.display_cc(p))
+      bcc = norm.(PropertySet.display_bcc(p))
+      message_id = norm.(PropertySet.get(p, :pr_internet_message_id))
+      first_rec_email = if(rec, do: norm.(rec.email), else: "")
+      body_preview = body |> norm.() |> String.slice(0, 160)
+      html_preview = html |> norm.() |> String.slice(0, 160)
+
+      # norm/1 strips NUL, so it is a safe separator for the text fields and
+      # the whole group costs one base64 pass. The path goes last so it may
+      # contain "|".
+      text =
+        Enum.join(
+          [subject, from, to, cc, bcc, message_id, first_rec_email, body_preview, html_preview],
+          <<0>>
+        )
+
+      IO.puts(Enum.join([
+        "ROW",
+        Integer.to_string(length(msg.recipients)),
+        Integer.to_string(length(msg.attachments)),
+        Integer.to_string(byte_size(body)),
+        Integer.to_string(byte_size(html)),
+        :crypto.hash(:sha256, body) |> Base.encode16(case: :lower),
+        :crypto.hash(:sha256, html) |> Base.encode16(case: :lower),
+        Base.encode64(text),
+        f
+      ], "|"))
+
+    {:error, reason} ->
+      IO.puts("ERR|" <> Base.encode64(inspect(reason)) <> "|" <> f)
+  end
+end
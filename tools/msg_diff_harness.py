@@ -1,253 +1,194 @@
 #!/usr/bin/env python3
 import argparse
+from base64 import b64decode as _b64d
+from concurrent.futures import ThreadPoolExecutor
+import glob
 import hashlib
-import json
 import os
-import re
-import subprocess
 import sys
 import tempfile
 from typing import Any
 
+from harness_common import (
+    cached,
+    canonical_paths,
+    dumps_pretty,
+    elixir_stamp,
+    enable_cache,
+    loads,
+    newest_mtime,
+    run_lines,
+    tree_stamp,
+)
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_RUBY_SCRIPT = os.path.join(_HERE, "msg_diff_harness.rb")
+_ELIXIR_SCRIPT = os.path.join(_HERE, "msg_diff_harness.exs")
+
+# Order of the NUL-joined text group in msg_diff_harness.exs ROW lines.
+_ELIXIR_TEXT_FIELDS = (
+    "subject",
+    "from",
+    "to",
+    "cc",
+    "bcc",
+    "message_id",
+    "first_recipient_email",
+    "body_preview",
+    "html_preview",
+)
+
+
+def _sha_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
 
 def _sha(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+    return _sha_bytes(text.encode("utf-8", errors="replace"))
+
+
+def _text_and_sha(v: str | bytes) -> tuple[str, str]:
+    # Hash raw bytes directly rather than decoding and re-encoding them.
+    if isinstance(v, bytes):
+        return v.decode("utf-8", errors="replace"), _sha_bytes(v)
+    return v, _sha(v)
 
 
 def _norm(v: Any) -> str:
     if v is None:
         return ""
-    s = str(v)
-    s = s.replace("\x00", "")
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return " ".join(str(v).replace("\x00", "").split())
 
 
 def _preview(v: Any, n: int = 160) -> str:
     return _norm(v)[:n]
 
 
-def _run(cmd: list[str], cwd: str | None = None) -> str:
-    p = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
-    if p.returncode != 0:
-        raise RuntimeError(f"Command failed: {' '.join(cmd)}\nSTDOUT:\n{p.stdout}\nSTDERR:\n{p.stderr}")
-    return p.stdout
+def _extract_msg_stamp() -> str:
+    from importlib import metadata
+
+    try:
+        version = metadata.version("extract-msg")
+    except metadata.PackageNotFoundError:
+        version = "missing"
+    return f"{version}:{tree_stamp(__file__)}"
 
 
+@cached("ruby-msg", lambda ruby_root: tree_stamp(os.path.join(ruby_root, "lib"), _RUBY_SCRIPT))
 def parse_ruby(files: list[str], ruby_root: str) -> dict[str, dict[str, Any]]:
-    ruby_code = r'''
-require "json"
-require "digest"
-require "mapi/msg"
-
-def norm(v)
-  return "" if v.nil?
-  v.to_s.gsub(/\x00/, "").gsub(/\s+/, " ").strip
-end
-
-ARGV.each do |f|
-  begin
-    msg = Mapi::Msg.open(f)
-    p = msg.props
-    body = (p.body || "").to_s
-    html = (p.body_html || "").to_s
-    rec = msg.recipients.first
-
-    out = {
-      parser: "ruby-msg",
-      file: f,
-      subject: norm(p.subject),
-      from: norm(msg.from),
-      to: norm(msg.to),
-      cc: norm(msg.cc),
-      bcc: norm(msg.bcc),
-      message_id: norm(p.internet_message_id),
-      recipient_count: msg.recipients.length,
-      attachment_count: msg.attachments.length,
-      first_recipient_email: norm(rec&.email),
-      body_len: body.bytesize,
-      html_len: html.bytesize,
-      body_sha256: Digest::SHA256.hexdigest(body),
-      html_sha256: Digest::SHA256.hexdigest(html),
-      body_preview: norm(body)[0,160],
-      html_preview: norm(html)[0,160]
-    }
-    puts JSON.generate(out)
-    msg.close
-  rescue => e
-    puts JSON.generate({parser: "ruby-msg", file: f, error: "#{e.class}: #{e.message}"})
-  end
-end
-'''
-    out = _run(["ruby", "-Ilib", "-e", ruby_code, *files], cwd=ruby_root)
+    if not files:
+        return {}
+
     results: dict[str, dict[str, Any]] = {}
-    for line in out.splitlines():
+    for line in run_lines(["ruby", "-Ilib", _RUBY_SCRIPT, *files], cwd=ruby_root):
         if not line.strip().startswith("{"):
             continue
-        row = json.loads(line)
+        row = loads(line)
         results[row["file"]] = row
     return results
 
 
+def _elixir_cmd(elixir_root: str, files: list[str]) -> list[str]:
+    # Skip the Mix project load when the dev build is current; fall back to
+    # `mix run` (which recompiles) whenever sources are newer than the build.
+    lib_dir = os.path.join(elixir_root, "_build", "dev", "lib")
+    app_ebin = os.path.join(lib_dir, "outlook_msg", "ebin")
+    if os.path.isdir(app_ebin):
+        built, _ = newest_mtime(app_ebin)
+        sources, _ = newest_mtime(os.path.join(elixir_root, "lib"), os.path.join(elixir_root, "mix.exs"))
+        if built >= sources:
+            code_paths = [arg for ebin in sorted(glob.glob(os.path.join(lib_dir, "*", "ebin"))) for arg in ("-pa", ebin)]
+            return ["elixir", *code_paths, _ELIXIR_SCRIPT, *files]
+    return ["mix", "run", _ELIXIR_SCRIPT, *files]
+
+
+@cached(
+    "outlook_msg",
+    lambda elixir_root: elixir_stamp(elixir_root, _ELIXIR_SCRIPT),
+)
 def parse_elixir(files: list[str], elixir_root: str) -> dict[str, dict[str, Any]]:
-    ex_code = r'''
-alias OutlookMsg.Mapi.PropertySet
-
-norm = fn v ->
-  case v do
-    nil -> ""
-    x -> x |> to_string() |> String.replace("\u0000", "") |> String.replace(~r/\s+/, " ") |> String.trim()
-  end
-end
-b64 = fn v -> Base.encode64(v || "") end
-
-for f <- System.argv() do
-  case OutlookMsg.open(f) do
-    {:ok, msg} ->
-      p = msg.properties
-      body = PropertySet.body(p) || ""
-      html = PropertySet.body_html(p) || ""
-      body = if is_binary(body), do: body, else: inspect(body)
-      html = if is_binary(html), do: html, else: inspect(html)
-      rec = List.first(msg.recipients)
-      subject = norm.(PropertySet.subject(p))
-      from = norm.(PropertySet.sender_name(p)) <> " <" <> norm.(PropertySet.sender_email(p)) <> ">"
-      to = norm.(PropertySet.display_to(p))
-      cc = norm.(PropertySet.display_cc(p))
-      bcc = norm.(PropertySet.display_bcc(p))
-      message_id = norm.(PropertySet.get(p, :pr_internet_message_id))
-      first_rec_email = if(rec, do: norm.(rec.email), else: "")
-      body_preview = body |> norm.() |> String.slice(0, 160)
-      html_preview = html |> norm.() |> String.slice(0, 160)
-
-      IO.puts(Enum.join([
-        "ROW",
-        f,
-        b64.(subject),
-        b64.(from),
-        b64.(to),
-        b64.(cc),
-        b64.(bcc),
-        b64.(message_id),
-        Integer.to_string(length(msg.recipients)),
-        Integer.to_string(length(msg.attachments)),
-        b64.(first_rec_email),
-        Integer.to_string(byte_size(body)),
-        Integer.to_string(byte_size(html)),
-        :crypto.hash(:sha256, body) |> Base.encode16(case: :lower),
-        :crypto.hash(:sha256, html) |> Base.encode16(case: :lower),
-        b64.(body_preview),
-        b64.(html_preview)
-      ], "|"))
-
-    {:error, reason} ->
-      IO.puts("ERR|" <> f <> "|" <> Base.encode64(inspect(reason)))
-  end
-end
-'''
-    out = _run(["mix", "run", "-e", ex_code, "--", *files], cwd=elixir_root)
+    # Text fields arrive already normalized by norm/1 in the .exs emitter (the
+    # Ruby emitter does the same), so they are not passed through _norm again.
+    if not files:
+        return {}
+
     results: dict[str, dict[str, Any]] = {}
-    for line in out.splitlines():
-        parts = line.strip().split("|")
-        if not parts:
-            continue
+    env = {**os.environ, "MIX_QUIET": "1"}
+    for line in run_lines(_elixir_cmd(elixir_root, files), cwd=elixir_root, env=env):
+        parts = line.rstrip("\r\n").split("|", 8)
         tag = parts[0]
-        if tag == "ROW" and len(parts) >= 17:
-            (
-                _,
-                file,
-                subject_b64,
-                from_b64,
-                to_b64,
-                cc_b64,
-                bcc_b64,
-                msgid_b64,
-                recipient_count,
-                attachment_count,
-                first_rec_b64,
-                body_len,
-                html_len,
-                body_sha256,
-                html_sha256,
-                body_prev_b64,
-                html_prev_b64,
-            ) = parts[:17]
-            dec = lambda s: __import__("base64").b64decode(s).decode("utf-8", errors="replace")
-            results[file] = {
-                "parser": "outlook_msg",
-                "file": file,
-                "subject": dec(subject_b64),
-                "from": dec(from_b64),
-                "to": dec(to_b64),
-                "cc": dec(cc_b64),
-                "bcc": dec(bcc_b64),
-                "message_id": dec(msgid_b64),
-                "recipient_count": int(recipient_count),
-                "attachment_count": int(attachment_count),
-                "first_recipient_email": dec(first_rec_b64),
-                "body_len": int(body_len),
-                "html_len": int(html_len),
-                "body_sha256": body_sha256,
-                "html_sha256": html_sha256,
-                "body_preview": dec(body_prev_b64),
-                "html_preview": dec(html_prev_b64),
-            }
+        if tag == "ROW" and len(parts) == 9:
+            _, recipient_count, attachment_count, body_len, html_len, body_sha256, html_sha256, text_b64, file = parts
+            row: dict[str, Any] = {"parser": "outlook_msg", "file": file}
+            row.update(zip(_ELIXIR_TEXT_FIELDS, _b64d(text_b64).decode("utf-8", errors="replace").split("\0")))
+            row["recipient_count"] = int(recipient_count)
+            row["attachment_count"] = int(attachment_count)
+            row["body_len"] = int(body_len)
+            row["html_len"] = int(html_len)
+            row["body_sha256"] = body_sha256
+            row["html_sha256"] = html_sha256
+            results[file] = row
         elif tag == "ERR" and len(parts) >= 3:
-            import base64
-            file = parts[1]
-            err = base64.b64decode(parts[2]).decode("utf-8", errors="replace")
+            _, err_b64, file = line.rstrip("\r\n").split("|", 2)
+            err = _b64d(err_b64).decode("utf-8", errors="replace")
             results[file] = {"parser": "outlook_msg", "file": file, "error": err}
     return results
 
 
-def parse_extract_msg(files: list[str]) -> dict[str, dict[str, Any]]:
+def _extract_msg_row(f: str) -> dict[str, Any]:
     import extract_msg  # type: ignore
 
-    out: dict[str, dict[str, Any]] = {}
-    for f in files:
+    try:
+        msg = extract_msg.Message(f)
+        body, body_sha = _text_and_sha(msg.body or "")
+        html, html_sha = _text_and_sha(msg.htmlBody or "")
+        recips = getattr(msg, "recipients", []) or []
+        atts = getattr(msg, "attachments", []) or []
+        first_rec_email = ""
+        if recips:
+            first = recips[0]
+            first_rec_email = _norm(getattr(first, "email", ""))
+        row = {
+            "parser": "extract-msg",
+            "file": f,
+            "subject": _norm(getattr(msg, "subject", "")),
+            "from": _norm(getattr(msg, "sender", "")),
+            "to": _norm(getattr(msg, "to", "")),
+            "cc": _norm(getattr(msg, "cc", "")),
+            "bcc": _norm(getattr(msg, "bcc", "")),
+            "message_id": _norm(getattr(msg, "messageId", "")),
+            "recipient_count": len(recips),
+            "attachment_count": len(atts),
+            "first_recipient_email": first_rec_email,
+            "body_len": len(body),
+            "html_len": len(html),
+            "body_sha256": body_sha,
+            "html_sha256": html_sha,
+            "body_preview": _preview(body),
+            "html_preview": _preview(html),
+        }
         try:
-            msg = extract_msg.Message(f)
-            body = msg.body or ""
-            html = msg.htmlBody or ""
-            if isinstance(html, bytes):
-                html = html.decode("utf-8", errors="replace")
-            recips = getattr(msg, "recipients", []) or []
-            atts = getattr(msg, "attachments", []) or []
-            first_rec_email = ""
-            if recips:
-                first = recips[0]
-                first_rec_email = _norm(getattr(first, "email", ""))
-            row = {
-                "parser": "extract-msg",
-                "file": f,
-                "subject": _norm(getattr(msg, "subject", "")),
-                "from": _norm(getattr(msg, "sender", "")),
-                "to": _norm(getattr(msg, "to", "")),
-                "cc": _norm(getattr(msg, "cc", "")),
-                "bcc": _norm(getattr(msg, "bcc", "")),
-                "message_id": _norm(getattr(msg, "messageId", "")),
-                "recipient_count": len(recips),
-                "attachment_count": len(atts),
-                "first_recipient_email": first_rec_email,
-                "body_len": len(body),
-                "html_len": len(html),
-                "body_sha256": _sha(body),
-                "html_sha256": _sha(html),
-                "body_preview": _preview(body),
-                "html_preview": _preview(html),
-            }
-            out[f] = row
-            try:
-                msg.close()
-            except Exception:
-                pass
-        except Exception as e:
-            out[f] = {"parser": "extract-msg", "file": f, "error": f"{type(e).__name__}: {e}"}
-    return out
+            msg.close()
+        except Exception:
+            pass
+        return row
+    except Exception as e:
+        return {"parser": "extract-msg", "file": f, "error": f"{type(e).__name__}: {e}"}
 
 
+@cached("extract-msg", _extract_msg_stamp)
+def parse_extract_msg(files: list[str]) -> dict[str, dict[str, Any]]:
+    import extract_msg  # type: ignore  # raise ImportError before starting workers
+
+    # extract-msg releases the GIL during its file and zlib reads, so files overlap.
+    workers = max(1, min(8, os.cpu_count() or 1, len(files)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return dict(zip(files, ex.map(_extract_msg_row, files)))
+
+
+@cached("msg-viewer", lambda viewer_root: tree_stamp(os.path.join(viewer_root, "lib"), __file__))
 def parse_msg_viewer(files: list[str], viewer_root: str) -> dict[str, dict[str, Any]]:
-    if not os.path.isdir(viewer_root):
+    if not files or not os.path.isdir(viewer_root):
         return {}
 
     ts = r'''
@@ -302,43 +243,65 @@ for (const f of files) {
         tmp.write(ts)
         script = tmp.name
 
+    rows = {}
     try:
-        out = _run(["bun", script, *files], cwd=viewer_root)
+        for line in run_lines(["bun", script, *files], cwd=viewer_root):
+            if line.strip().startswith("{"):
+                r = loads(line)
+                rows[r["file"]] = r
     finally:
         try:
             os.remove(script)
         except OSError:
             pass
-
-    rows = {}
-    for line in out.splitlines():
-        if line.strip().startswith("{"):
-            r = json.loads(line)
-            rows[r["file"]] = r
     return rows
 
 
-def compare(files: list[str], parsers: dict[str, dict[str, dict[str, Any]]]) -> dict[str, Any]:
-    fields = [
-        "subject",
-        "from",
-        "to",
-        "recipient_count",
-        "attachment_count",
-        "first_recipient_email",
-        "body_len",
-        "html_len",
-    ]
+def run_parsers(jobs: list[tuple[str, Any, tuple[Any, ...]]]) -> dict[str, dict[str, dict[str, Any]]]:
+    # Parsers are dominated by interpreter startup and subprocess wait, so
+    # threads are enough to overlap them. Results keep the job order.
+    if not jobs:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(jobs)) as ex:
+        futures = [(name, ex.submit(fn, *fn_args)) for name, fn, fn_args in jobs]
+        return {name: fut.result() for name, fut in futures}
+
+
+# Semantic fields compared across parsers.
+_FIELDS = (
+    "subject",
+    "from",
+    "to",
+    "recipient_count",
+    "attachment_count",
+    "first_recipient_email",
+    "body_len",
+    "html_len",
+)
+
 
+def _signature(row: dict[str, Any]) -> tuple[Any, ...]:
+    return tuple(row.get(field) for field in _FIELDS)
+
+
+def compare(files: list[str], parsers: dict[str, dict[str, dict[str, Any]]]) -> dict[str, Any]:
     summary: dict[str, Any] = {"files": {}}
     for f in files:
         by_parser = {name: data.get(f, {}) for name, data in parsers.items()}
         mismatches = {}
-        for field in fields:
-            vals = {name: by_parser[name].get(field) for name in by_parser if by_parser[name]}
-            uniq = set(json.dumps(v, sort_keys=True) for v in vals.values())
-            if len(uniq) > 1:
-                mismatches[field] = vals
+        try:
+            agree = len({_signature(row) for row in by_parser.values() if row}) <= 1
+        except TypeError:
+            agree = False
+        if not agree:
+            for field in _FIELDS:
+                vals = {name: by_parser[name].get(field) for name in by_parser if by_parser[name]}
+                try:
+                    uniq = set(vals.values())
+                except TypeError:
+                    uniq = set(repr(v) for v in vals.values())
+                if len(uniq) > 1:
+                    mismatches[field] = vals
 
         summary["files"][f] = {
             "parsers": by_parser,
@@ -347,6 +310,10 @@ def compare(files: list[str], parsers: dict[str, dict[str, dict[str, Any]]]) ->
     return summary
 
 
+# Length fields use a tolerance band (floor, ratio of baseline) to reduce false alarms.
+_TOL = {"body_len": (128, 0.02), "html_len": (4096, 0.05)}
+
+
 def _severity(field: str) -> str:
     if field in {"subject", "recipient_count", "attachment_count", "first_recipient_email"}:
         return "high"
@@ -358,46 +325,34 @@ def _severity(field: str) -> str:
 
 
 def baseline_diff(files: list[str], parsers: dict[str, dict[str, dict[str, Any]]], baseline: str) -> dict[str, Any]:
-    fields = [
-        "subject",
-        "from",
-        "to",
-        "recipient_count",
-        "attachment_count",
-        "first_recipient_email",
-        "body_len",
-        "html_len",
-    ]
-
     out: dict[str, Any] = {"files": {}}
     base_data = parsers.get(baseline, {})
+    comparators = [(name, pdata) for name, pdata in parsers.items() if name != baseline]
+    tol_get = _TOL.get
 
     for f in files:
         base = base_data.get(f, {})
+        base_get = base.get
+        base_sig = _signature(base)
         file_rows = {}
-        for parser_name, pdata in parsers.items():
-            if parser_name == baseline:
-                continue
+        for parser_name, pdata in comparators:
             row = pdata.get(f, {})
             issues = []
             if not base:
                 issues.append({"field": "parser", "severity": "high", "baseline": None, "actual": row, "note": "missing baseline row"})
             elif not row:
                 issues.append({"field": "parser", "severity": "high", "baseline": base, "actual": None, "note": "missing comparator row"})
-            else:
-                for field in fields:
-                    bv = base.get(field)
-                    rv = row.get(field)
+            elif _signature(row) != base_sig:
+                row_get = row.get
+                for field in _FIELDS:
+                    bv = base_get(field)
+                    rv = row_get(field)
                     if bv == rv:
                         continue
-                    # Length fields use tolerance band to reduce false alarms.
-                    if field == "body_len":
-                        tol = max(128, int((bv or 0) * 0.02))
-                        if isinstance(bv, int) and isinstance(rv, int) and abs(bv - rv) <= tol:
-                            continue
-                    if field == "html_len":
-                        tol = max(4096, int((bv or 0) * 0.05))
-                        if isinstance(bv, int) and isinstance(rv, int) and abs(bv - rv) <= tol:
+                    tol = tol_get(field)
+                    if tol is not None and isinstance(bv, int) and isinstance(rv, int):
+                        floor, ratio = tol
+                        if abs(bv - rv) <= max(floor, int(bv * ratio)):
                             continue
                     issues.append({
                         "field": field,
@@ -411,7 +366,7 @@ def baseline_diff(files: list[str], parsers: dict[str, dict[str, dict[str, Any]]
 
 
 def main() -> int:
-    ap = argparse.ArgumentParser(description="Differential .msg parser harness (no content persisted).")
+    ap = argparse.ArgumentParser(description="Differential .msg parser harness (no content persisted unless --cache is given).")
     ap.add_argument("files", nargs="+", help=".msg files to compare")
     ap.add_argument("--ruby-root", default="/home/sprite/ruby-msg")
     ap.add_argument("--elixir-root", default="/home/sprite/outlook_msg")
@@ -426,20 +381,25 @@ def main() -> int:
         help="Show only deviations from a single baseline parser.",
     )
     ap.add_argument("--json", action="store_true", help="Emit full JSON payload")
+    ap.add_argument("--cache", action="store_true", help="reuse per-file parser rows cached on disk; rows hold subjects, addresses, message ids and body/HTML previews")
     args = ap.parse_args()
 
-    files = [os.path.abspath(f) for f in args.files]
+    if args.cache:
+        enable_cache()
 
-    parsers: dict[str, dict[str, dict[str, Any]]] = {}
+    files = canonical_paths(args.files)
 
+    jobs: list[tuple[str, Any, tuple[Any, ...]]] = []
     if not args.no_ruby:
-        parsers["ruby-msg"] = parse_ruby(files, args.ruby_root)
+        jobs.append(("ruby-msg", parse_ruby, (files, args.ruby_root)))
     if not args.no_elixir:
-        parsers["outlook_msg"] = parse_elixir(files, args.elixir_root)
+        jobs.append(("outlook_msg", parse_elixir, (files, args.elixir_root)))
     if not args.no_extract_msg:
-        parsers["extract-msg"] = parse_extract_msg(files)
+        jobs.append(("extract-msg", parse_extract_msg, (files,)))
     if args.with_msg_viewer:
-        parsers["msg-viewer"] = parse_msg_viewer(files, args.msg_viewer_root)
+        jobs.append(("msg-viewer", parse_msg_viewer, (files, args.msg_viewer_root)))
+
+    parsers = run_parsers(jobs)
 
     if args.baseline_parser:
         payload = baseline_diff(files, parsers, args.baseline_parser)
@@ -447,7 +407,7 @@ def main() -> int:
         payload = compare(files, parsers)
 
     if args.json:
-        print(json.dumps(payload, indent=2, sort_keys=True))
+        print(dumps_pretty(payload))
         return 0
 
     if args.baseline_parser:
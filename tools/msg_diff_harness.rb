@@ -0,0 +1,45 @@
+# Row emitter for tools/msg_diff_harness.py (run from the ruby-msg root):
+#   ruby -Ilib msg_diff_harness.rb FILE...
+
+require "json"
+require "digest"
+require "mapi/msg"
+
+def norm(v)
+  return "" if v.nil?
+  v.to_s.gsub(/\x00/, "").gsub(/\s+/, " ").strip
+end
+
+ARGV.each do |f|
+  begin
+    msg = Mapi::Msg.open(f)
+    p = msg.props
+    body = (p.body || "").to_s
+    html = (p.body_html || "").to_s
+    rec = msg.recipients.first
+
+    out = {
+      parser: "ruby-msg",
+      file: f,
+      subject: norm(p.subject),
+      from: norm(msg.from),
+      to: norm(msg.to),
+      cc: norm(msg.cc),
+      bcc: norm(msg.bcc),
+      message_id: norm(p.internet_message_id),
+      recipient_count: msg.recipients.length,
+      attachment_count: msg.attachments.length,
+      first_recipient_email: norm(rec&.email),
+      body_len: body.bytesize,
+      html_len: html.bytesize,
+      body_sha256: Digest::SHA256.hexdigest(body),
+      html_sha256: Digest::SHA256.hexdigest(html),
+      body_preview: norm(body)[0,160],
+      html_preview: norm(html)[0,160]
+    }
+    puts JSON.generate(out)
+    msg.close
+  rescue => e
+    puts JSON.generate({parser: "ruby-msg", file: f, error: "#{e.class}: #{e.message}"})
+  end
+end
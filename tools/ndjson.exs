@@ -0,0 +1,23 @@
+# Minimal NDJSON encoder shared by the gate emitters (warning_gate.exs,
+# pst_semantic_gate.exs). The project has no JSON dependency, so values are
+# encoded here; load with Code.require_file("ndjson.exs", __DIR__).
+
+defmodule OutlookMsgTools.NDJSON do
+  # stdout must stay valid UTF-8, so invalid bytes become U+FFFD before escaping.
+  def scrub(s) do
+    if String.valid?(s) do
+      s
+    else
+      s |> String.codepoints() |> Enum.map_join(fn c -> if String.valid?(c), do: c, else: "\uFFFD" end)
+    end
+  end
+
+  def str(v), do: "\"" <> Regex.replace(~r/["\\\x00-\x1f]/, scrub(to_string(v || "")), &escape/1) <> "\""
+
+  # pairs are {key, already-encoded value}; one object per line.
+  def obj(pairs), do: "{" <> Enum.map_join(pairs, ",", fn {k, v} -> str(k) <> ":" <> v end) <> "}"
+
+  defp escape("\""), do: "\\\""
+  defp escape("\\"), do: "\\\\"
+  defp escape(<<c>>), do: "\\u" <> String.pad_leading(Integer.to_string(c, 16), 4, "0")
+end
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 import os
 import shutil
 import subprocess
+import tempfile
 from typing import Any
 
+from harness_common import canonical_paths, run_lines
+
 
 def _run(cmd: list[str], cwd: str | None = None) -> str:
     p = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
@@ -27,43 +31,63 @@ for f <- System.argv() do
   end
 end
 '''
-    out = _run(["mix", "run", "-e", ex, "--", *pst_files], cwd=elixir_root)
     rows: dict[str, dict[str, Any]] = {}
-    for line in out.splitlines():
+    for line in run_lines(["mix", "run", "-e", ex, "--", *pst_files], cwd=elixir_root):
+        # str.split always yields at least one element, so parts[0] is safe.
         parts = line.strip().split("|")
-        if not parts:
-            continue
-        if parts[0] == "ROW" and len(parts) >= 5:
+        tag = parts[0]
+        if tag == "ROW" and len(parts) >= 5:
             _, f, items, folders, messages = parts[:5]
             rows[f] = {
                 "item_count": int(items),
                 "folder_count": int(folders),
                 "message_count": int(messages),
             }
-        elif parts[0] == "ERR" and len(parts) >= 3:
+        elif tag == "ERR" and len(parts) >= 3:
             rows[parts[1]] = {"error": parts[2]}
     return rows
 
 
+# Every casing of ".eml", so str.endswith can match without lowercasing each name.
+_EML_SUFFIXES = (".eml", ".emL", ".eMl", ".eML", ".Eml", ".EmL", ".EMl", ".EML")
+
+
+def _count_eml(root: str) -> tuple[int, int]:
+    # Iterative scandir walk; DirEntry type checks use the cached d_type, no stat.
+    eml = 0
+    dirs = 0
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs += 1
+                    stack.append(entry.path)
+                elif entry.name.endswith(_EML_SUFFIXES):
+                    eml += 1
+    return eml, dirs
+
+
+def _probe_one_readpst(f: str) -> tuple[str, dict[str, Any]]:
+    try:
+        # readpst writes files to output dir; use temp dir and count generated eml files.
+        with tempfile.TemporaryDirectory() as td:
+            _run(["readpst", "-D", "-M", "-q", "-o", td, f])
+            eml, dirs = _count_eml(td)
+            return f, {"eml_count": eml, "folder_dirs": dirs}
+    except Exception as e:
+        return f, {"error": f"{type(e).__name__}: {e}"}
+
+
 def probe_readpst(pst_files: list[str]) -> dict[str, dict[str, Any]]:
-    if shutil.which("readpst") is None:
+    if not pst_files or shutil.which("readpst") is None:
         return {}
 
+    # Each readpst run is independent; fan out across cores.
     rows: dict[str, dict[str, Any]] = {}
-    for f in pst_files:
-        try:
-            # readpst writes files to output dir; use temp dir and count generated eml files.
-            import tempfile
-            with tempfile.TemporaryDirectory() as td:
-                _run(["readpst", "-D", "-M", "-q", "-o", td, f])
-                eml = 0
-                dirs = 0
-                for root, dnames, fnames in os.walk(td):
-                    dirs += len(dnames)
-                    eml += sum(1 for n in fnames if n.lower().endswith(".eml"))
-                rows[f] = {"eml_count": eml, "folder_dirs": dirs}
-        except Exception as e:
-            rows[f] = {"error": f"{type(e).__name__}: {e}"}
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(pst_files))) as ex:
+        for f, row in ex.map(_probe_one_readpst, pst_files):
+            rows[f] = row
     return rows
 
 
@@ -73,7 +97,7 @@ def main() -> int:
     ap.add_argument("--elixir-root", default="/home/sprite/outlook_msg")
     args = ap.parse_args()
 
-    files = [os.path.abspath(f) for f in args.files]
+    files = canonical_paths(args.files)
     elx = probe_outlook_msg(files, args.elixir_root)
     rp = probe_readpst(files)
 
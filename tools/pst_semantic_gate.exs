@@ -0,0 +1,41 @@
+# Row emitter for tools/pst_semantic_gate.py (run from the outlook_msg root):
+#   mix run tools/pst_semantic_gate.exs FILE...
+# One JSON object per file on stdout, keyed by "i", the file's position among
+# the FILE args (paths are not echoed; see warning_gate.exs).
+
+Code.require_file("ndjson.exs", __DIR__)
+alias OutlookMsgTools.NDJSON
+
+for {f, i} <- Enum.with_index(System.argv()) do
+  case OutlookMsg.open_pst_with_report(f) do
+    {:ok, pst, warnings} ->
+      codes =
+        warnings
+        |> Enum.map(fn w ->
+          case w do
+            %OutlookMsg.Warning{code: code} -> to_string(code)
+            _ -> "unstructured_warning"
+          end
+        end)
+        |> Enum.uniq()
+        |> Enum.sort()
+
+      IO.puts(NDJSON.obj([
+        {"i", Integer.to_string(i)},
+        {"status", NDJSON.str("ok")},
+        {"index_count", Integer.to_string(map_size(pst.index || %{}))},
+        {"descriptor_count", Integer.to_string(map_size(pst.descriptors || %{}))},
+        {"codes", "[" <> Enum.map_join(codes, ",", &NDJSON.str/1) <> "]"}
+      ]))
+
+    {:error, reason} ->
+      IO.puts(NDJSON.obj([
+        {"i", Integer.to_string(i)},
+        {"status", NDJSON.str("error")},
+        {"index_count", "0"},
+        {"descriptor_count", "0"},
+        {"codes", "[]"},
+        {"error", NDJSON.str(inspect(reason))}
+      ]))
+  end
+end
@@ -1,72 +1,67 @@
 #!/usr/bin/env python3
 import argparse
-import base64
 import os
-import subprocess
-import sys
-from typing import Any
+from typing import Any, Callable
 
+from harness_common import cached, canonical_paths, elixir_stamp, enable_cache, loads as _loads, run_lines
 
-def _run(cmd: list[str], cwd: str) -> str:
-    p = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
-    if p.returncode != 0:
-      raise RuntimeError(f"Command failed: {' '.join(cmd)}\nSTDERR:\n{p.stderr}")
-    return p.stdout
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ELIXIR_SCRIPT = os.path.join(_HERE, "pst_semantic_gate.exs")
+_NDJSON_EXS = os.path.join(_HERE, "ndjson.exs")
 
 
+# Rows are invalidated when the Elixir sources, the emitter or this script
+# change; error rows are always re-run.
+@cached(
+    "pst_semantic_gate",
+    lambda elixir_root: elixir_stamp(elixir_root, __file__, _ELIXIR_SCRIPT, _NDJSON_EXS),
+    lambda row: row.get("status") == "ok",
+)
 def collect(files: list[str], elixir_root: str) -> dict[str, dict[str, Any]]:
-    ex = r'''
-for f <- System.argv() do
-  case OutlookMsg.open_pst_with_report(f) do
-    {:ok, pst, warnings} ->
-      codes =
-        warnings
-        |> Enum.map(fn w ->
-          case w do
-            %OutlookMsg.Warning{code: code} -> to_string(code)
-            _ -> "unstructured_warning"
-          end
-        end)
-        |> Enum.uniq()
-        |> Enum.sort()
-        |> Enum.join(",")
-
-      IO.puts(Enum.join([
-        "ROW",
-        f,
-        "ok",
-        Integer.to_string(map_size(pst.index || %{})),
-        Integer.to_string(map_size(pst.descriptors || %{})),
-        Base.encode64(codes)
-      ], "|"))
-
-    {:error, reason} ->
-      IO.puts("ROW|" <> f <> "|error|0|0|" <> Base.encode64(inspect(reason)))
-  end
-end
-'''
-    out = _run(["mix", "run", "-e", ex, "--", *files], cwd=elixir_root)
+    # Rows carry the file's argv position, not its path, so a path the BEAM
+    # had to scrub to UTF-8 still maps back to the file. Files without a row
+    # are left out and reported by main().
     rows: dict[str, dict[str, Any]] = {}
-    for line in out.splitlines():
-      parts = line.strip().split("|")
-      if len(parts) >= 6 and parts[0] == "ROW":
-        _, f, status, idx_count, desc_count, payload = parts[:6]
-        rows[f] = {
-          "status": status,
-          "index_count": int(idx_count),
-          "descriptor_count": int(desc_count),
-          "codes": [c for c in base64.b64decode(payload).decode("utf-8", errors="replace").split(",") if c],
-        }
+    loads = _loads
+    for line in run_lines(["mix", "run", _ELIXIR_SCRIPT, *files], cwd=elixir_root, text=False):
+      if line.startswith(b"{"):
+        row = loads(line)
+        i = row.pop("i", None)
+        if not isinstance(i, int) or not 0 <= i < len(files):
+          raise RuntimeError(f"pst_semantic_gate.exs emitted a row for unknown file index {i!r}: {line!r}")
+        rows[files[i]] = row
     return rows
 
 
+_REQUIRED_CORRUPT = frozenset({"pst_index_parse_failed", "pst_descriptor_parse_failed"})
+
+
+def _default_rule(codes: frozenset[str]) -> str | None:
+    # Generic requirement: no hard error and bounded warning set.
+    if len(codes) > 20:
+      return f"excessive warning cardinality ({len(codes)})"
+    return None
+
+
+# Per-fixture expectations keyed by basename. Each rule returns a failure
+# message, or None when the file's warning codes are acceptable.
+RULES: dict[str, Callable[[frozenset[str]], str | None]] = {
+    "minimal_pst97.pst": lambda c: f"expected clean parse, got warning codes {sorted(c)}" if c else None,
+    "corrupt_offsets_pst97.pst": lambda c: None if c & _REQUIRED_CORRUPT else f"expected parse-failed warning code, got {sorted(c)}",
+    "loop_branch_index_pst97.pst": lambda c: None if "pst_branch_loop_detected" in c else f"expected pst_branch_loop_detected, got {sorted(c)}",
+}
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="PST semantic gate for recovery guarantees on known corruption classes.")
     ap.add_argument("files", nargs="+", help=".pst files")
     ap.add_argument("--elixir-root", default="/home/sprite/outlook_msg")
+    ap.add_argument("--cache", action="store_true", help="reuse cached PST rows; rows hold only status, index/descriptor counts and warning codes")
     args = ap.parse_args()
 
-    files = [os.path.abspath(f) for f in args.files]
+    if args.cache:
+      enable_cache()
+    files = canonical_paths(args.files)
     rows = collect(files, args.elixir_root)
     failures: list[str] = []
 
@@ -77,25 +72,15 @@ def main() -> int:
         failures.append(f"{f}: missing output row")
         continue
       if row["status"] != "ok":
-        failures.append(f"{f}: parser returned error {row['codes']}")
+        failures.append(f"{f}: parser returned error {row.get('error')}")
         continue
 
-      codes = set(row["codes"])
-
-      if base == "minimal_pst97.pst":
-        if codes:
-          failures.append(f"{f}: expected clean parse, got warning codes {sorted(codes)}")
-      elif base == "corrupt_offsets_pst97.pst":
-        required = {"pst_index_parse_failed", "pst_descriptor_parse_failed"}
-        if not (codes & required):
-          failures.append(f"{f}: expected parse-failed warning code, got {sorted(codes)}")
-      elif base == "loop_branch_index_pst97.pst":
-        if "pst_branch_loop_detected" not in codes:
-          failures.append(f"{f}: expected pst_branch_loop_detected, got {sorted(codes)}")
-      else:
-        # Generic requirement: no hard error and bounded warning set.
-        if len(codes) > 20:
-          failures.append(f"{f}: excessive warning cardinality ({len(codes)})")
+      # Rows stay JSON lists so they can be cached; rules only test membership
+      # and intersection, so an immutable set is enough.
+      codes = frozenset(row["codes"])
+      err = RULES.get(base, _default_rule)(codes)
+      if err:
+        failures.append(f"{f}: {err}")
 
     if failures:
       print("PST SEMANTIC GATE FAILED")
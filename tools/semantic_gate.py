@@ -4,6 +4,8 @@ import os
 import sys
 from typing import Any
 
+from harness_common import canonical_paths, enable_cache
+
 
 def _load_harness():
     here = os.path.dirname(os.path.abspath(__file__))
@@ -16,6 +18,9 @@ def _load_harness():
 def _norm(v: Any) -> str:
     if v is None:
         return ""
+    # NULs are dropped (not turned into spaces) before whitespace collapses.
+    # split/join beats a single re.sub here: both run in C, and the regex
+    # engine's per-match overhead dominates on typical header values.
     return " ".join(str(v).replace("\x00", "").split())
 
 
@@ -34,13 +39,19 @@ def main() -> int:
     ap.add_argument("files", nargs="+", help=".msg files")
     ap.add_argument("--ruby-root", default="/home/sprite/ruby-msg")
     ap.add_argument("--elixir-root", default="/home/sprite/outlook_msg")
+    ap.add_argument("--cache", action="store_true", help="reuse cached ruby-msg/outlook_msg rows; same cache and row content as msg_diff_harness.py --cache")
     args = ap.parse_args()
 
-    files = [os.path.abspath(f) for f in args.files]
-
     harness = _load_harness()
-    ruby = harness.parse_ruby(files, args.ruby_root)
-    elixir = harness.parse_elixir(files, args.elixir_root)
+    if args.cache:
+        enable_cache()
+    files = canonical_paths(args.files)
+    parsers = harness.run_parsers([
+        ("ruby-msg", harness.parse_ruby, (files, args.ruby_root)),
+        ("outlook_msg", harness.parse_elixir, (files, args.elixir_root)),
+    ])
+    ruby = parsers["ruby-msg"]
+    elixir = parsers["outlook_msg"]
 
     failures: list[str] = []
 
@@ -63,13 +74,15 @@ def main() -> int:
         # Length drift thresholds
         rb = int(r.get("body_len", 0))
         eb = int(e.get("body_len", 0))
-        if abs(rb - eb) > _body_tol(rb):
-            failures.append(f"[{name}] body_len drift ruby={rb} elixir={eb} tol={_body_tol(rb)}")
+        bt = _body_tol(rb)
+        if abs(rb - eb) > bt:
+            failures.append(f"[{name}] body_len drift ruby={rb} elixir={eb} tol={bt}")
 
         rh = int(r.get("html_len", 0))
         eh = int(e.get("html_len", 0))
-        if abs(rh - eh) > _html_tol(rh):
-            failures.append(f"[{name}] html_len drift ruby={rh} elixir={eh} tol={_html_tol(rh)}")
+        ht = _html_tol(rh)
+        if abs(rh - eh) > ht:
+            failures.append(f"[{name}] html_len drift ruby={rh} elixir={eh} tol={ht}")
 
         # Only fail hard on HTML loss when ruby has meaningful HTML and no
         # plain-text fallback. If ruby already has body text, html-only loss
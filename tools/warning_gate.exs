@@ -0,0 +1,63 @@
+# Row emitter for tools/warning_gate.py (run from the outlook_msg root):
+#   mix run tools/warning_gate.exs EXT|* FILE...
+# One JSON object per line: {"t":"ok"|"warn"|"err","i":index,...}, where i is
+# the file's position among the FILE args. Paths are not echoed: a non-UTF-8
+# path would come back scrubbed and no longer match what the caller passed.
+
+Code.require_file("ndjson.exs", __DIR__)
+alias OutlookMsg.Warning
+alias OutlookMsgTools.NDJSON
+
+opener = fn
+  ".msg" -> &OutlookMsg.open_with_report/1
+  ".eml" -> &OutlookMsg.open_eml_with_report/1
+  ".pst" -> &OutlookMsg.open_pst_with_report/1
+  _ -> fn _ -> {:error, :unsupported_extension} end
+end
+
+# argv is either one lowercased extension followed by paths that share it (the
+# opener is picked once per run), or "*" followed by mixed paths (picked per file).
+[ext | paths] = System.argv()
+
+open =
+  case ext do
+    "*" -> fn f -> opener.(String.downcase(Path.extname(f))).(f) end
+    _ -> opener.(ext)
+  end
+
+for {f, i} <- Enum.with_index(paths) do
+  idx = Integer.to_string(i)
+
+  case open.(f) do
+    {:ok, _obj, warnings} ->
+      if warnings == [] do
+        IO.puts(NDJSON.obj([{"t", NDJSON.str("ok")}, {"i", idx}]))
+      else
+        # One row per {code, severity, recoverable} with a count and the first
+        # context/message as a sample; the policy never looks past those three.
+        warnings
+        |> Enum.map(fn
+          %Warning{} = ww -> {ww.code, ww.severity, ww.recoverable, ww.context, ww.message}
+          txt -> {"unstructured_warning", "warn", true, "", txt}
+        end)
+        |> Enum.with_index()
+        |> Enum.group_by(fn {{code, sev, rec, _ctx, _msg}, _i} -> {code, sev, rec} end)
+        |> Enum.sort_by(fn {_key, [{_w, first} | _]} -> first end)
+        |> Enum.each(fn {{code, sev, rec}, [{{_, _, _, ctx, msg}, _} | _] = group} ->
+          IO.puts(NDJSON.obj([
+            {"t", NDJSON.str("warn")},
+            {"i", idx},
+            {"code", NDJSON.str(code)},
+            {"severity", NDJSON.str(sev)},
+            {"recoverable", if(rec, do: "true", else: "false")},
+            {"count", Integer.to_string(length(group))},
+            {"context", NDJSON.str(ctx)},
+            {"message", NDJSON.str(msg)}
+          ]))
+        end)
+      end
+
+    {:error, reason} ->
+      IO.puts(NDJSON.obj([{"t", NDJSON.str("err")}, {"i", idx}, {"message", NDJSON.str(inspect(reason))}]))
+  end
+end
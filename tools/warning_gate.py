@@ -1,102 +1,103 @@
 #!/usr/bin/env python3
 import argparse
-import base64
-import json
+from concurrent.futures import ThreadPoolExecutor
 import os
-import subprocess
-import sys
 from typing import Any
 
+from harness_common import cached, canonical_paths, elixir_stamp, enable_cache, loads as _loads, run_lines
 
-def _run(cmd: list[str], cwd: str) -> str:
-    p = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
-    if p.returncode != 0:
-      raise RuntimeError(f"Command failed: {' '.join(cmd)}\nSTDERR:\n{p.stderr}")
-    return p.stdout
-
-
-def collect_warnings(files: list[str], elixir_root: str) -> dict[str, list[dict[str, Any]]]:
-    ex = r'''
-alias OutlookMsg.Warning
-
-enc = fn v -> Base.encode64(to_string(v || "")) end
-
-for f <- System.argv() do
-  ext = String.downcase(Path.extname(f))
-
-  result =
-    case ext do
-      ".msg" -> OutlookMsg.open_with_report(f)
-      ".eml" -> OutlookMsg.open_eml_with_report(f)
-      ".pst" -> OutlookMsg.open_pst_with_report(f)
-      _ -> {:error, :unsupported_extension}
-    end
-
-  case result do
-    {:ok, _obj, warnings} ->
-      if warnings == [] do
-        IO.puts("OK|" <> f)
-      else
-        for w <- warnings do
-          case w do
-            %Warning{} = ww ->
-              IO.puts(Enum.join([
-                "WARN",
-                f,
-                enc.(ww.code),
-                enc.(ww.severity),
-                enc.(if(ww.recoverable, do: "true", else: "false")),
-                enc.(ww.context || ""),
-                enc.(ww.message)
-              ], "|"))
-
-            txt ->
-              IO.puts(Enum.join([
-                "WARN",
-                f,
-                enc.("unstructured_warning"),
-                enc.("warn"),
-                enc.("true"),
-                enc.(""),
-                enc.(txt)
-              ], "|"))
-          end
-        end
-      end
-
-    {:error, reason} ->
-      IO.puts("ERR|" <> f <> "|" <> Base.encode64(inspect(reason)))
-  end
-end
-'''
-
-    out = _run(["mix", "run", "-e", ex, "--", *files], cwd=elixir_root)
-    rows: dict[str, list[dict[str, Any]]] = {f: [] for f in files}
-
-    for line in out.splitlines():
-      parts = line.strip().split("|")
-      if not parts:
-        continue
-      if parts[0] == "WARN" and len(parts) >= 7:
-        _, f, code, sev, rec, ctx, msg = parts[:7]
-        dec = lambda s: base64.b64decode(s).decode("utf-8", errors="replace")
-        rows.setdefault(f, []).append({
-          "code": dec(code),
-          "severity": dec(sev),
-          "recoverable": dec(rec) == "true",
-          "context": dec(ctx),
-          "message": dec(msg),
-        })
-      elif parts[0] == "ERR" and len(parts) >= 3:
-        rows.setdefault(parts[1], []).append({
-          "code": "parse_error",
-          "severity": "error",
-          "recoverable": False,
-          "context": "",
-          "message": base64.b64decode(parts[2]).decode("utf-8", errors="replace"),
-        })
-      elif parts[0] == "OK" and len(parts) >= 2:
-        rows.setdefault(parts[1], [])
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ELIXIR_SCRIPT = os.path.join(_HERE, "warning_gate.exs")
+_NDJSON_EXS = os.path.join(_HERE, "ndjson.exs")
+
+
+def _cacheable(warnings: list[dict[str, Any]]) -> bool:
+    # Parse errors may be transient (I/O, a crashed run); never cache them.
+    return all(w.get("code") != "parse_error" for w in warnings)
+
+
+# Rows are invalidated when the Elixir sources, the emitter or this script
+# change; rows with a parse_error are always re-run.
+@cached(
+    "warning_gate",
+    lambda elixir_root, *_: elixir_stamp(elixir_root, __file__, _ELIXIR_SCRIPT, _NDJSON_EXS),
+    _cacheable,
+)
+def collect_warnings(files: list[str], elixir_root: str, workers: int = 1) -> dict[str, list[dict[str, Any]]]:
+    def parse(job: tuple[str, list[str]]) -> dict[str, list[dict[str, Any]]]:
+      ext, shard = job
+      # Rows carry the file's argv position, not its path, so a path the BEAM
+      # had to scrub to UTF-8 still lands in the right bucket.
+      buckets: list[list[dict[str, Any]]] = [[] for _ in shard]
+      seen = [False] * len(shard)
+
+      loads = _loads
+      for line in run_lines(["mix", "run", _ELIXIR_SCRIPT, ext, *shard], cwd=elixir_root, text=False):
+        if not line.startswith(b"{"):
+          continue
+        rec = loads(line)
+        tag = rec.pop("t", None)
+        i = rec.pop("i", None)
+        if not isinstance(i, int) or not 0 <= i < len(shard):
+          raise RuntimeError(f"warning_gate.exs emitted a row for unknown file index {i!r}: {line!r}")
+        seen[i] = True
+        bucket = buckets[i]
+        if tag == "warn":
+          bucket.append(rec)
+        elif tag == "err":
+          bucket.append({
+            "code": "parse_error",
+            "severity": "error",
+            "recoverable": False,
+            "count": 1,
+            "context": "",
+            "message": rec.get("message", ""),
+          })
+
+      # A file the emitter never reported on fails the gate rather than passing clean.
+      for i, ok in enumerate(seen):
+        if not ok:
+          buckets[i].append({
+            "code": "parse_error",
+            "severity": "error",
+            "recoverable": False,
+            "count": 1,
+            "context": "",
+            "message": "no output row from warning_gate.exs",
+          })
+      return dict(zip(shard, buckets))
+
+    if not files:
+      return {}
+    n = max(1, min(workers, len(files)))
+    if n == 1:
+      # A single BEAM; the emitter picks the opener per file ("*").
+      return parse(("*", files))
+
+    # Give each shard a single extension only when that needs no more than n
+    # BEAMs; otherwise shard mixed. Either way at most n `mix run`s start.
+    by_ext: dict[str, list[str]] = {}
+    for f in files:
+      by_ext.setdefault(os.path.splitext(f)[1].lower(), []).append(f)
+    if len(by_ext) <= n:
+      # One shard per extension, then each spare worker goes to the extension
+      # with the most paths per shard.
+      shards = dict.fromkeys(by_ext, 1)
+      for _ in range(n - len(by_ext)):
+        ext = max(shards, key=lambda e: len(by_ext[e]) / shards[e])
+        shards[ext] += 1
+      jobs = [(ext, group[i::shards[ext]]) for ext, group in by_ext.items() for i in range(min(shards[ext], len(group)))]
+    else:
+      jobs = [("*", files[i::n]) for i in range(n)]
+
+    # Compile once up front so concurrent `mix run` shards do not race on _build.
+    for _ in run_lines(["mix", "compile"], cwd=elixir_root, text=False):
+      pass
+    # Each shard is its own BEAM; threads only wait on the subprocesses.
+    rows: dict[str, list[dict[str, Any]]] = {}
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+      for part in pool.map(parse, jobs):
+        rows.update(part)
     return rows
 
 
@@ -105,42 +106,58 @@ def main() -> int:
     ap.add_argument("files", nargs="+", help="input files (.msg/.eml/.pst)")
     ap.add_argument("--policy", default="/home/sprite/outlook_msg/tools/warning_policy.json")
     ap.add_argument("--elixir-root", default="/home/sprite/outlook_msg")
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="concurrent mix run shards; each boots its own BEAM, so only worth it for large inputs (e.g. many big PSTs)",
+    )
+    ap.add_argument("--cache", action="store_true", help="reuse cached warning rows; rows hold warning codes, counts and one sample context/message per code")
     args = ap.parse_args()
 
-    with open(args.policy, "r", encoding="utf-8") as fh:
-      policy = json.load(fh)
+    with open(args.policy, "rb") as fh:
+      policy = _loads(fh.read())
 
-    files = [os.path.abspath(f) for f in args.files]
-    warnings_by_file = collect_warnings(files, args.elixir_root)
+    if args.cache:
+      enable_cache()
+    files = canonical_paths(args.files)
+    warnings_by_file = collect_warnings(files, args.elixir_root, args.workers)
 
-    fail_sev = set(policy.get("fail_on_severity", ["error"]))
+    fail_sev = frozenset(policy.get("fail_on_severity", ["error"]))
     fail_nonrec = bool(policy.get("fail_on_non_recoverable", True))
     max_per_file = int(policy.get("max_warnings_per_file", 50))
-    allow_codes = set(policy.get("allow_codes", []))
+    allow_codes = frozenset(policy.get("allow_codes", []))
 
     failures: list[str] = []
+    failures_append = failures.append
+    warnings_get = warnings_by_file.get
 
     for f in files:
-      rows = warnings_by_file.get(f, [])
-      if len(rows) > max_per_file:
-        failures.append(f"{f}: too many warnings ({len(rows)} > {max_per_file})")
+      rows = warnings_get(f, [])
+      # Rows are aggregated per code/severity/recoverable; the cap counts
+      # the warnings they stand for.
+      total = sum(w.get("count", 1) for w in rows)
+      if total > max_per_file:
+        # One cap failure per file; listing each excess warning would only
+        # bloat the report.
+        failures_append(f"{f}: too many warnings ({total} > {max_per_file})")
+        continue
 
       for w in rows:
         code = str(w.get("code", ""))
         sev = str(w.get("severity", "warn"))
-        rec = bool(w.get("recoverable", True))
-        msg = str(w.get("message", ""))
 
         if allow_codes and code not in allow_codes:
-          failures.append(f"{f}: warning code not allowlisted: {code}")
+          failures_append(f"{f}: warning code not allowlisted: {code}")
           continue
 
+        # The message is only needed once a warning is being reported.
         if sev in fail_sev:
-          failures.append(f"{f}: disallowed severity {sev} code={code} message={msg}")
+          failures_append(f"{f}: disallowed severity {sev} code={code} message={w.get('message', '')}")
           continue
 
-        if fail_nonrec and not rec:
-          failures.append(f"{f}: non-recoverable warning code={code} message={msg}")
+        if fail_nonrec and not w.get("recoverable", True):
+          failures_append(f"{f}: non-recoverable warning code={code} message={w.get('message', '')}")
 
     if failures:
       print("WARNING POLICY GATE FAILED")